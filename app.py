@@ -1,15 +1,16 @@
+import asyncio
 import os
 import sqlite3
 import hashlib
-import requests
+import hmac
+import threading
+import zlib
+import httpx
 import streamlit as st
+import numpy as np
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import json
-from typing import Dict, List, Optional, Tuple
-import re
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Tuple
 
 # ---------------------- Config ----------------------
 BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8000")  # FastAPI default
@@ -51,98 +52,171 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ---------------------- Enhanced Database Setup ----------------------
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    
-    # Users table
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            username TEXT PRIMARY KEY,
-            password_hash TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            user_type TEXT DEFAULT 'Student',
-            monthly_income REAL DEFAULT 0,
-            savings_goal REAL DEFAULT 0
-        )
-    """)
-    
-    # Chat history table
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS chat_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT,
-            user_message TEXT,
-            bot_response TEXT,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (username) REFERENCES users(username)
-        )
-    """)
-    
-    # Expenses tracking table
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS expenses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT,
-            category TEXT,
-            amount REAL,
-            description TEXT,
-            date DATE DEFAULT CURRENT_DATE,
-            FOREIGN KEY (username) REFERENCES users(username)
-        )
-    """)
-    
-    # Investment portfolio table
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS investments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT,
-            investment_type TEXT,
-            amount REAL,
-            returns REAL DEFAULT 0,
-            date_invested DATE DEFAULT CURRENT_DATE,
-            FOREIGN KEY (username) REFERENCES users(username)
-        )
-    """)
-    
-    conn.commit()
-    conn.close()
+# Streamlit serves each session on its own thread, so guard the shared
+# connection with a lock instead of opening a fresh one per helper call.
+_db_lock = threading.Lock()
+
+# Stable module-level SQL literals for the hot insert paths, so sqlite3's
+# per-connection statement cache always hits and parse/plan runs once.
+INSERT_CHAT = "INSERT INTO chat_history (username, user_message, bot_response) VALUES (?, ?, ?)"
+INSERT_EXPENSE = "INSERT INTO expenses (username, category, amount, description) VALUES (?, ?, ?, ?)"
+INSERT_INVESTMENT = "INSERT INTO investments (username, investment_type, amount, returns) VALUES (?, ?, ?, ?)"
+
+@st.cache_resource
+def get_conn() -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        DB_FILE, check_same_thread=False, isolation_level=None, cached_statements=256
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+# Bump together with a new entry in _MIGRATIONS below; CREATE TABLE IF
+# NOT EXISTS cannot alter existing tables, so schema changes need their
+# own migration step.
+SCHEMA_VERSION = 2
+
+_SCHEMA_DDL = """
+    CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        password_hash BLOB NOT NULL,
+        salt BLOB NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        user_type TEXT DEFAULT 'Student',
+        monthly_income REAL DEFAULT 0,
+        savings_goal REAL DEFAULT 0
+    );
+
+    CREATE TABLE IF NOT EXISTS chat_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT,
+        user_message TEXT,
+        bot_response BLOB,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (username) REFERENCES users(username)
+    );
+
+    CREATE TABLE IF NOT EXISTS expenses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT,
+        category TEXT,
+        amount REAL,
+        description TEXT,
+        date DATE DEFAULT CURRENT_DATE,
+        FOREIGN KEY (username) REFERENCES users(username)
+    );
+
+    CREATE TABLE IF NOT EXISTS investments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT,
+        investment_type TEXT,
+        amount REAL,
+        returns REAL DEFAULT 0,
+        date_invested DATE DEFAULT CURRENT_DATE,
+        FOREIGN KEY (username) REFERENCES users(username)
+    );
+
+    -- Per-user indexes so history/expense/investment lookups use a btree
+    -- scan instead of a full table scan + sort
+    CREATE INDEX IF NOT EXISTS idx_chat_user_ts ON chat_history(username, timestamp DESC);
+    CREATE INDEX IF NOT EXISTS idx_expenses_user ON expenses(username);
+    CREATE INDEX IF NOT EXISTS idx_investments_user ON investments(username);
+"""
+
+def _migrate_v1(conn: sqlite3.Connection):
+    conn.executescript(_SCHEMA_DDL)
+
+def _migrate_v2(conn: sqlite3.Connection):
+    # Databases created before the PBKDF2 change lack the salt column and
+    # hold unsalted SHA-256 hex digests. Add the column (NULL for legacy
+    # rows); validate_user re-hashes each account on its next successful
+    # login. Fresh databases already get salt from _SCHEMA_DDL.
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(users)")]
+    if "salt" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN salt BLOB")
+
+# Entry N upgrades a database at user_version N-1 to N. Each step must be
+# safe on both fresh databases and ones created by older app versions.
+_MIGRATIONS = {
+    1: _migrate_v1,
+    2: _migrate_v2,
+}
 
-def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
+def init_db():
+    conn = get_conn()
+    # user_version gate: on a warm database this is one pragma lookup
+    # instead of re-parsing every CREATE statement. Each version is
+    # stamped only after its migration succeeds, so a failed upgrade is
+    # retried on the next start instead of being skipped forever.
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target in range(version + 1, SCHEMA_VERSION + 1):
+        _MIGRATIONS[target](conn)
+        conn.execute(f"PRAGMA user_version = {target}")
+
+@st.cache_resource
+def get_worker_pool() -> ThreadPoolExecutor:
+    # Keeps blocking commits/fsyncs off the script thread on slow disks
+    return ThreadPoolExecutor(max_workers=4)
+
+@st.cache_resource
+def _init_db_once() -> bool:
+    # Run the DDL once per server process instead of on every rerun
+    init_db()
+    return True
+
+# PBKDF2 keeps the SHA-256 rounds inside OpenSSL (SHA-NI where available)
+# instead of paying Python-level overhead per round.
+PBKDF2_ITERATIONS = 120_000
+
+def hash_password(password: str, salt: bytes) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, PBKDF2_ITERATIONS)
 
 def register_user(username: str, password: str, user_type: str = "Student") -> bool:
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    try:
-        c.execute(
-            "INSERT INTO users (username, password_hash, user_type) VALUES (?, ?, ?)", 
-            (username, hash_password(password), user_type)
-        )
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
+    salt = os.urandom(16)
+    with _db_lock:
+        try:
+            get_conn().execute(
+                "INSERT INTO users (username, password_hash, salt, user_type) VALUES (?, ?, ?, ?)",
+                (username, hash_password(password, salt), salt, user_type)
+            )
+        except sqlite3.IntegrityError:
+            return False
+    get_user_profile.clear()
+    return True
+
+def _upgrade_legacy_password(username: str, password: str, stored: str) -> bool:
+    # Accounts from before the PBKDF2 change hold an unsalted SHA-256 hex
+    # digest; verify against that, then re-hash with a fresh salt so the
+    # account is upgraded in place.
+    legacy = hashlib.sha256(password.encode()).hexdigest()
+    if not hmac.compare_digest(stored, legacy):
         return False
-    finally:
-        conn.close()
+    salt = os.urandom(16)
+    with _db_lock:
+        get_conn().execute(
+            "UPDATE users SET password_hash=?, salt=? WHERE username=?",
+            (hash_password(password, salt), salt, username)
+        )
+    return True
 
 def validate_user(username: str, password: str) -> bool:
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT password_hash FROM users WHERE username=?", (username,))
-    row = c.fetchone()
-    conn.close()
-    return row and row[0] == hash_password(password)
+    with _db_lock:
+        c = get_conn().execute("SELECT password_hash, salt FROM users WHERE username=?", (username,))
+        row = c.fetchone()
+    if not row:
+        return False
+    if row[1] is None:
+        return _upgrade_legacy_password(username, password, row[0])
+    return hmac.compare_digest(row[0], hash_password(password, row[1]))
 
+@st.cache_data(ttl=300, show_spinner=False)
 def get_user_profile(username: str) -> Dict:
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute(
-        "SELECT user_type, monthly_income, savings_goal FROM users WHERE username=?", 
-        (username,)
-    )
-    row = c.fetchone()
-    conn.close()
+    with _db_lock:
+        c = get_conn().execute(
+            "SELECT user_type, monthly_income, savings_goal FROM users WHERE username=?",
+            (username,)
+        )
+        row = c.fetchone()
     if row:
         return {
             "user_type": row[0],
@@ -152,138 +226,174 @@ def get_user_profile(username: str) -> Dict:
     return {"user_type": "Student", "monthly_income": 0, "savings_goal": 0}
 
 def update_user_profile(username: str, user_type: str, income: float, savings_goal: float):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute(
-        "UPDATE users SET user_type=?, monthly_income=?, savings_goal=? WHERE username=?",
-        (user_type, income, savings_goal, username)
-    )
-    conn.commit()
-    conn.close()
+    with _db_lock:
+        get_conn().execute(
+            "UPDATE users SET user_type=?, monthly_income=?, savings_goal=? WHERE username=?",
+            (user_type, income, savings_goal, username)
+        )
+    get_user_profile.clear()
 
 def save_chat_history(username: str, user_msg: str, bot_response: str):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute(
-        "INSERT INTO chat_history (username, user_message, bot_response) VALUES (?, ?, ?)",
-        (username, user_msg, bot_response)
+    # Buffer the row; flush_chats() writes the batch in one transaction so
+    # each fsync amortizes over several chat turns. Long LLM replies are
+    # stored zlib-compressed (level 1) so more rows fit per DB page.
+    st.session_state.pending_chats.append(
+        (username, user_msg, zlib.compress(bot_response.encode(), 1))
     )
-    conn.commit()
-    conn.close()
 
+def flush_chats():
+    pending = st.session_state.get("pending_chats", [])
+    if not pending:
+        return
+    with _db_lock:
+        conn = get_conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(INSERT_CHAT, pending)
+            conn.execute("COMMIT")
+        except Exception:
+            # Leave the shared autocommit connection clean; an orphaned
+            # transaction would break every later BEGIN.
+            conn.execute("ROLLBACK")
+            raise
+    pending.clear()
+    get_chat_history.clear()
+
+def _decode_response(bot_response) -> str:
+    # Rows written before compression landed are plain text
+    if isinstance(bot_response, bytes):
+        return zlib.decompress(bot_response).decode()
+    return bot_response
+
+@st.cache_data(ttl=300, show_spinner=False)
 def get_chat_history(username: str, limit: int = 10) -> List[Tuple]:
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute(
-        "SELECT user_message, bot_response, timestamp FROM chat_history WHERE username=? ORDER BY timestamp DESC LIMIT ?",
-        (username, limit)
-    )
-    history = c.fetchall()
-    conn.close()
-    return history
+    with _db_lock:
+        c = get_conn().execute(
+            "SELECT user_message, bot_response, timestamp FROM chat_history WHERE username=? ORDER BY timestamp DESC LIMIT ?",
+            (username, limit)
+        )
+        rows = c.fetchall()
+    return [(msg, _decode_response(resp), ts) for msg, resp, ts in rows]
 
 def add_expense(username: str, category: str, amount: float, description: str):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute(
-        "INSERT INTO expenses (username, category, amount, description) VALUES (?, ?, ?, ?)",
-        (username, category, amount, description)
-    )
-    conn.commit()
-    conn.close()
+    with _db_lock:
+        get_conn().execute(INSERT_EXPENSE, (username, category, amount, description))
+    get_expenses.clear()
 
+@st.cache_data(ttl=300, show_spinner=False)
 def get_expenses(username: str) -> pd.DataFrame:
-    conn = sqlite3.connect(DB_FILE)
-    query = "SELECT category, amount, description, date FROM expenses WHERE username=?"
-    df = pd.read_sql_query(query, conn, params=(username,))
-    conn.close()
-    return df
+    with _db_lock:
+        rows = get_conn().execute(
+            "SELECT category, amount, description, date FROM expenses WHERE username=?",
+            (username,)
+        ).fetchall()
+    return pd.DataFrame.from_records(rows, columns=["category", "amount", "description", "date"])
 
 def add_investment(username: str, inv_type: str, amount: float, returns: float = 0):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute(
-        "INSERT INTO investments (username, investment_type, amount, returns) VALUES (?, ?, ?, ?)",
-        (username, inv_type, amount, returns)
-    )
-    conn.commit()
-    conn.close()
+    with _db_lock:
+        get_conn().execute(INSERT_INVESTMENT, (username, inv_type, amount, returns))
+    get_investments.clear()
 
+@st.cache_data(ttl=300, show_spinner=False)
 def get_investments(username: str) -> pd.DataFrame:
-    conn = sqlite3.connect(DB_FILE)
-    query = "SELECT investment_type, amount, returns, date_invested FROM investments WHERE username=?"
-    df = pd.read_sql_query(query, conn, params=(username,))
-    conn.close()
-    return df
+    with _db_lock:
+        rows = get_conn().execute(
+            "SELECT investment_type, amount, returns, date_invested FROM investments WHERE username=?",
+            (username,)
+        ).fetchall()
+    return pd.DataFrame.from_records(rows, columns=["investment_type", "amount", "returns", "date_invested"])
 
 # ---------------------- Session State ----------------------
-if "logged_in" not in st.session_state:
-    st.session_state.logged_in = False
-if "username" not in st.session_state:
-    st.session_state.username = ""
-if "chat_messages" not in st.session_state:
-    st.session_state.chat_messages = []
-if "current_page" not in st.session_state:
-    st.session_state.current_page = "chatbot"
+st.session_state.setdefault("logged_in", False)
+st.session_state.setdefault("username", "")
+st.session_state.setdefault("chat_messages", [])
+st.session_state.setdefault("current_page", st.query_params.get("page", "chatbot"))
+st.session_state.setdefault("pending_chats", [])
 
 # ---------------------- Helpers ----------------------
+# Budget templates precomputed at import so the hot path is a single
+# vectorized multiply. Unknown user types fall back to Professional.
+_BUDGETS = {
+    "Student": (np.array([0.50, 0.30, 0.20]), ("Essentials", "Education", "Savings")),
+    "Professional": (
+        np.array([0.40, 0.20, 0.20, 0.20]),
+        ("Essentials", "Savings", "Investments", "Discretionary")
+    ),
+}
+
 def get_budget_summary(user_type: str, income: float = 0) -> Dict:
-    if user_type == "Student":
-        budget = {
-            "Essentials": 0.50,
-            "Education": 0.30,
-            "Savings": 0.20
-        }
-    else:
-        budget = {
-            "Essentials": 0.40,
-            "Savings": 0.20,
-            "Investments": 0.20,
-            "Discretionary": 0.20
-        }
-    
+    ratios, names = _BUDGETS.get(user_type, _BUDGETS["Professional"])
     if income > 0:
-        return {k: v * income for k, v in budget.items()}
-    return budget
+        return dict(zip(names, (ratios * income).tolist()))
+    return dict(zip(names, ratios.tolist()))
 
-def call_backend(prompt: str, user_type: str) -> str:
+def _build_payload(prompt: str, user_type: str) -> Dict:
     system = (
         f"You are a helpful financial assistant specializing in Indian personal finance. "
         f"Give concise, practical guidance with India-specific examples. "
         f"User type: {user_type}. Include relevant tax laws, investment options like PPF, NPS, ELSS, "
         f"and Indian banking practices where applicable."
     )
-    payload = {
+    return {
         "prompt": prompt,
         "system": system,
         "max_new_tokens": 256,
         "temperature": 0.2,
         "top_p": 0.95
     }
+
+@st.cache_resource
+def get_http_client() -> httpx.Client:
+    # One HTTP/2 session shared by every backend call, so the health check
+    # and generate requests multiplex over a single TCP/TLS connection.
+    return httpx.Client(
+        http2=True, timeout=60, limits=httpx.Limits(keepalive_expiry=60)
+    )
+
+@st.cache_data(ttl=3600, show_spinner="Thinking...")
+def call_backend(prompt: str, user_type: str) -> str:
     url = f"{BACKEND_URL}/v1/generate"
-    resp = requests.post(url, json=payload, timeout=60)
+    resp = get_http_client().post(url, json=_build_payload(prompt, user_type))
     resp.raise_for_status()
     data = resp.json()
     return data["generated_text"]
 
+def call_backend_stream(prompt: str, user_type: str):
+    """Yield generated tokens as the backend streams them (SSE)."""
+    url = f"{BACKEND_URL}/v1/generate/stream"
+    with get_http_client().stream("POST", url, json=_build_payload(prompt, user_type)) as resp:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if line.startswith("data: "):
+                yield line[len("data: "):]
+
+async def _call_async(client: httpx.AsyncClient, prompt: str, user_type: str) -> str:
+    url = f"{BACKEND_URL}/v1/generate"
+    resp = await client.post(url, json=_build_payload(prompt, user_type))
+    resp.raise_for_status()
+    return resp.json()["generated_text"]
+
+def call_backend_many(prompts: List[str], user_type: str) -> List[str]:
+    """Fan several prompts out to the backend concurrently."""
+    async def run():
+        async with httpx.AsyncClient(timeout=60) as client:
+            return await asyncio.gather(*[_call_async(client, p, user_type) for p in prompts])
+    return asyncio.run(run())
+
+# New tax regime slabs (simplified): lower bound of each slab, cumulative
+# tax owed up to that bound, and the marginal rate within the slab.
+_SLAB_LOWER = np.array([0, 300_000, 600_000, 900_000, 1_200_000, 1_500_000])
+_SLAB_BASE = np.array([0, 0, 15_000, 45_000, 90_000, 150_000])
+_SLAB_RATE = np.array([0.0, 0.05, 0.10, 0.15, 0.20, 0.30])
+
 def calculate_tax(income: float, user_type: str) -> Dict:
     """Simple Indian tax calculator"""
     annual_income = income * 12
-    
-    # New tax regime (simplified)
-    if annual_income <= 300000:
-        tax = 0
-    elif annual_income <= 600000:
-        tax = (annual_income - 300000) * 0.05
-    elif annual_income <= 900000:
-        tax = 15000 + (annual_income - 600000) * 0.10
-    elif annual_income <= 1200000:
-        tax = 45000 + (annual_income - 900000) * 0.15
-    elif annual_income <= 1500000:
-        tax = 90000 + (annual_income - 1200000) * 0.20
-    else:
-        tax = 150000 + (annual_income - 1500000) * 0.30
-    
+
+    # Branchless slab lookup instead of an if/elif ladder
+    i = np.searchsorted(_SLAB_LOWER, annual_income, side='right') - 1
+    tax = float(_SLAB_BASE[i] + (annual_income - _SLAB_LOWER[i]) * _SLAB_RATE[i])
+
     # Add cess
     cess = tax * 0.04
     total_tax = tax + cess
@@ -297,26 +407,43 @@ def calculate_tax(income: float, user_type: str) -> Dict:
         "effective_rate": (total_tax / annual_income * 100) if annual_income > 0 else 0
     }
 
+def _hash_df(df: pd.DataFrame) -> str:
+    # Content hash so cached figures invalidate only when the data changes
+    return hashlib.md5(pd.util.hash_pandas_object(df).values.tobytes()).hexdigest()
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _hash_df})
 def create_expense_chart(df: pd.DataFrame):
+    import plotly.express as px
+
     if df.empty:
         return None
-    
-    # Group by category
-    category_totals = df.groupby('category')['amount'].sum().reset_index()
-    
+
+    # Group by category. For the common small frame a plain dict
+    # accumulation beats pandas' groupby hash-table machinery.
+    if len(df) < 256:
+        totals = {}
+        for cat, amt in zip(df['category'].to_numpy(), df['amount'].to_numpy()):
+            totals[cat] = totals.get(cat, 0) + amt
+        names, values = list(totals.keys()), list(totals.values())
+    else:
+        category_totals = df.groupby('category', sort=False, observed=True, as_index=False)['amount'].sum()
+        names, values = category_totals['category'], category_totals['amount']
+
     fig = px.pie(
-        category_totals, 
-        values='amount', 
-        names='category',
+        values=values,
+        names=names,
         title='Expense Distribution',
         color_discrete_sequence=px.colors.qualitative.Set3
     )
     return fig
 
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _hash_df})
 def create_investment_chart(df: pd.DataFrame):
+    import plotly.graph_objects as go
+
     if df.empty:
         return None
-    
+
     fig = go.Figure()
     
     # Add bars for investment amounts
@@ -359,13 +486,18 @@ def login_page():
             password = st.text_input("Password", type="password", key="login_password")
             
             if st.button("Login", type="primary"):
-                if validate_user(username, password):
-                    st.session_state.logged_in = True
-                    st.session_state.username = username
-                    st.success(f"✅ Welcome back, {username}!")
-                    st.rerun()
+                try:
+                    valid = get_worker_pool().submit(validate_user, username, password).result(timeout=5)
+                except FutureTimeoutError:
+                    st.error("⚠️ Login timed out — the database is responding slowly. Please try again.")
                 else:
-                    st.error("❌ Invalid username or password")
+                    if valid:
+                        st.session_state.logged_in = True
+                        st.session_state.username = username
+                        st.success(f"✅ Welcome back, {username}!")
+                        st.rerun()
+                    else:
+                        st.error("❌ Invalid username or password")
         
         with tab2:
             new_username = st.text_input("New Username", key="reg_username")
@@ -377,10 +509,20 @@ def login_page():
                     st.error("⚠️ Username and password cannot be empty")
                 elif len(new_password) < 6:
                     st.error("⚠️ Password must be at least 6 characters")
-                elif register_user(new_username, new_password, user_type):
-                    st.success("✅ Registration successful! You can now log in.")
                 else:
-                    st.error("⚠️ Username already exists. Try another.")
+                    try:
+                        # Registration pays the full PBKDF2 cost on top of
+                        # the insert, so give it a longer leash than login.
+                        created = get_worker_pool().submit(
+                            register_user, new_username, new_password, user_type
+                        ).result(timeout=15)
+                    except FutureTimeoutError:
+                        st.error("⚠️ Registration timed out — the database is responding slowly. Please try again.")
+                    else:
+                        if created:
+                            st.success("✅ Registration successful! You can now log in.")
+                        else:
+                            st.error("⚠️ Username already exists. Try another.")
 
 def sidebar_menu():
     with st.sidebar:
@@ -389,32 +531,39 @@ def sidebar_menu():
         st.markdown("---")
         
         if st.button("💬 Chatbot", use_container_width=True):
+            flush_chats()
             st.session_state.current_page = "chatbot"
-            st.rerun()
+            st.query_params["page"] = "chatbot"
         
         if st.button("👤 Profile", use_container_width=True):
+            flush_chats()
             st.session_state.current_page = "profile"
-            st.rerun()
+            st.query_params["page"] = "profile"
         
         if st.button("💵 Expense Tracker", use_container_width=True):
+            flush_chats()
             st.session_state.current_page = "expenses"
-            st.rerun()
+            st.query_params["page"] = "expenses"
         
         if st.button("📈 Investments", use_container_width=True):
+            flush_chats()
             st.session_state.current_page = "investments"
-            st.rerun()
+            st.query_params["page"] = "investments"
         
         if st.button("🧮 Tax Calculator", use_container_width=True):
+            flush_chats()
             st.session_state.current_page = "tax"
-            st.rerun()
+            st.query_params["page"] = "tax"
         
         if st.button("📜 History", use_container_width=True):
+            flush_chats()
             st.session_state.current_page = "history"
-            st.rerun()
+            st.query_params["page"] = "history"
         
         st.markdown("---")
         
         if st.button("🚪 Logout", use_container_width=True):
+            flush_chats()
             st.session_state.logged_in = False
             st.session_state.username = ""
             st.session_state.chat_messages = []
@@ -436,7 +585,7 @@ def chatbot_page():
     with col4:
         if st.button("🔄 Check Backend"):
             try:
-                h = requests.get(f"{BACKEND_URL}/health", timeout=10).json()
+                h = get_http_client().get(f"{BACKEND_URL}/health", timeout=10).json()
                 st.success(f"Backend OK: {h['status']}")
             except Exception as e:
                 st.error(f"Backend not reachable: {e}")
@@ -461,23 +610,27 @@ def chatbot_page():
         with st.chat_message("user"):
             st.write(user_input)
         
-        # Get bot response
+        # Get bot response, rendering tokens as they stream in
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                try:
-                    response = call_backend(user_input, profile["user_type"])
-                    st.write(response)
-                    
-                    # Save to history
-                    save_chat_history(st.session_state.username, user_input, response)
-                    
-                    # Add bot message
-                    st.session_state.chat_messages.append({"role": "assistant", "content": response})
-                    
-                except Exception as e:
-                    st.error(f"Error: {e}")
+            placeholder = st.empty()
+            response = ""
+            try:
+                for token in call_backend_stream(user_input, profile["user_type"]):
+                    response += token
+                    placeholder.markdown(response)
+
+                # Save to history
+                save_chat_history(st.session_state.username, user_input, response)
+
+                # Add bot message
+                st.session_state.chat_messages.append({"role": "assistant", "content": response})
+
+            except Exception as e:
+                st.error(f"Error: {e}")
 
 def profile_page():
+    import plotly.express as px
+
     st.title("👤 User Profile")
     
     profile = get_user_profile(st.session_state.username)
@@ -540,8 +693,8 @@ def expense_tracker_page():
         expenses_df = get_expenses(st.session_state.username)
         
         if not expenses_df.empty:
-            # Show total
-            total_expenses = expenses_df['amount'].sum()
+            # Show total (ndarray.sum skips pandas' per-call dispatch)
+            total_expenses = expenses_df['amount'].to_numpy().sum()
             st.metric("Total Expenses", f"₹{total_expenses:,.0f}")
             
             # Show chart
@@ -580,9 +733,9 @@ def investment_page():
         investments_df = get_investments(st.session_state.username)
         
         if not investments_df.empty:
-            # Calculate totals
-            total_invested = investments_df['amount'].sum()
-            total_returns = investments_df['returns'].sum()
+            # Calculate totals (ndarray.sum skips pandas' per-call dispatch)
+            total_invested = investments_df['amount'].to_numpy().sum()
+            total_returns = investments_df['returns'].to_numpy().sum()
             roi = (total_returns / total_invested * 100) if total_invested > 0 else 0
             
             col_a, col_b, col_c = st.columns(3)
@@ -631,8 +784,10 @@ def tax_calculator_page():
             if monthly_income > 0:
                 tax_info = calculate_tax(monthly_income, profile["user_type"])
                 
-                # Ask backend for tax saving tips
-                prompt = f"Give me top 3 tax saving tips for someone earning ₹{monthly_income} per month in India"
+                # Ask backend for tax saving tips. Quantize the income so
+                # nearby salaries share a cache entry in call_backend.
+                income_bucket = int(round(monthly_income / 5000) * 5000)
+                prompt = f"Give me top 3 tax saving tips for someone earning ₹{income_bucket} per month in India"
                 try:
                     tips = call_backend(prompt, profile["user_type"])
                     st.session_state.tax_tips = tips
@@ -698,7 +853,7 @@ def main_app():
         chatbot_page()
 
 # ---------------------- Main ----------------------
-init_db()
+_init_db_once()
 
 if st.session_state.logged_in:
     main_app()